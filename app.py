@@ -1,13 +1,17 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
 import sqlite3
-import time
 import base64
+import threading
 import numpy as np
 import cv2
-from flask import Flask, render_template, request, jsonify, send_from_directory, url_for
+from flask import Flask, render_template, request, jsonify, send_from_directory, url_for, g
 
-from config import Config
-from src.register_face import register_face
+from config import Config, cohort_model_paths
+from src.event_log import EventLog
+from src.recognition_cache import RecognitionCache, crop_fingerprint, crop_thumbnail
 import json
 import logging
 import re
@@ -26,6 +30,24 @@ import os
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Per-request JSONL records (logs/events.<pid>.jsonl), written off the request path
+event_log = EventLog(
+    app.config["EVENT_LOG_DIR"],
+    max_queue=app.config["EVENT_LOG_QUEUE_SIZE"],
+    max_bytes=app.config["EVENT_LOG_MAX_BYTES"],
+    max_age=app.config["EVENT_LOG_MAX_AGE"],
+    backups=app.config["EVENT_LOG_BACKUPS"],
+    retention=app.config["EVENT_LOG_RETENTION"],
+) if app.config["EVENT_LOG_ENABLED"] else None
+
+# predict() results for near-identical face crops, keyed by (model, version, crop hash)
+recognition_cache = RecognitionCache(
+    max_size=app.config["RECOGNITION_CACHE_SIZE"],
+    ttl=app.config["RECOGNITION_CACHE_TTL"],
+    max_bits=app.config["RECOGNITION_CACHE_MAX_BITS"],
+    max_diff=app.config["RECOGNITION_CACHE_MAX_DIFF"],
+) if app.config["RECOGNITION_CACHE_SIZE"] > 0 else None
+
 # -------------------- Utilities --------------------
 def ensure_dirs():
     os.makedirs(app.config["DATA_DIR"], exist_ok=True)
@@ -62,6 +84,23 @@ def init_db():
                 FOREIGN KEY(user_id) REFERENCES users(id)
             )
         """)
+        # Cohorts (events/groups): a kiosk only recognizes members of its cohort
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS cohorts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS user_cohorts (
+                user_id INTEGER NOT NULL,
+                cohort_id INTEGER NOT NULL,
+                PRIMARY KEY(user_id, cohort_id),
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(cohort_id) REFERENCES cohorts(id)
+            )
+        """)
         con.commit()
         con.close()
         logger.info("Database initialized successfully.")
@@ -69,12 +108,170 @@ def init_db():
         logger.error(f"Error initializing database: {e}")
         raise
 
+COHORT_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+def parse_cohort_names(value):
+    """
+    Normalize a cohort field (single name or list of names) to a list of names.
+    Raises ValueError on an invalid name.
+    """
+    if value is None or value == "" or value == []:
+        return []
+    if isinstance(value, str):
+        names = [value]
+    elif isinstance(value, (list, tuple)) and all(isinstance(n, str) for n in value):
+        names = list(value)
+    else:
+        raise ValueError("Cohort must be a name or a list of names")
+    names = [n.strip() for n in names]
+    for n in names:
+        if not COHORT_RE.match(n):
+            raise ValueError(f"Invalid cohort name: {n!r}. Only letters, digits, '_' and '-' allowed.")
+    return names
+
+def add_user_to_cohorts(cur, user_name: str, cohorts):
+    for cohort in cohorts:
+        cur.execute("INSERT OR IGNORE INTO cohorts(name) VALUES(?)", (cohort,))
+        cur.execute("""
+            INSERT OR IGNORE INTO user_cohorts(user_id, cohort_id)
+            SELECT u.id, c.id FROM users u, cohorts c WHERE u.name=? AND c.name=?
+        """, (user_name, cohort))
+
+def cohort_memberships():
+    """
+    Return {cohort_name: [user_name, ...]} for every cohort (empty cohorts included).
+    """
+    con = db()
+    cur = con.cursor()
+    cur.execute("""
+        SELECT c.name AS cohort, u.name AS user
+        FROM cohorts c
+        LEFT JOIN user_cohorts uc ON uc.cohort_id = c.id
+        LEFT JOIN users u ON u.id = uc.user_id
+        ORDER BY c.name, u.name
+    """)
+    memberships = {}
+    for row in cur.fetchall():
+        members = memberships.setdefault(row["cohort"], [])
+        if row["user"]:
+            members.append(row["user"])
+    con.close()
+    return memberships
+
+def model_paths(cohort=None):
+    """
+    Return (model_path, label_map_path) for the global model, or for a cohort's model.
+    """
+    if not cohort:
+        return app.config["MODEL_PATH"], app.config["LABEL_MAP_PATH"]
+    return cohort_model_paths(app.config["COHORT_MODELS_DIR"], cohort)
+
 def now_ts() -> str:
     return time.strftime("%Y-%m-%d %H:%M:%S")
 
 def json_error(message: str, status: int = 400):
     return jsonify({"ok": False, "error": message}), status
 
+# -------------------- Model Resources --------------------
+CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+
+_resource_lock = threading.Lock()
+_detect_lock = threading.Lock()  # CascadeClassifier keeps per-call state; not thread-safe
+_cascade = None
+_models = {}  # model_path -> {"mtime": ..., "recognizer": ..., "label_map": ...}
+
+# Startup / readiness bookkeeping (all durations in ms)
+_readiness = {
+    "ready": False,
+    "model_loaded": False,
+    "cohort_models_loaded": 0,
+    "startup_ms": None,
+    "warmup_ms": None,
+    "first_recognition_ms": None,
+    "error": None,
+}
+
+def get_cascade():
+    """
+    Return the shared Haar cascade, loading it once per process.
+    """
+    global _cascade
+    if _cascade is None:
+        with _resource_lock:
+            if _cascade is None:
+                cascade = cv2.CascadeClassifier(CASCADE_PATH)
+                if cascade.empty():
+                    raise RuntimeError(f"Failed to load cascade: {CASCADE_PATH}")
+                _cascade = cascade
+    return _cascade
+
+def detect_faces(gray):
+    """
+    detectMultiScale on the shared cascade, serialized across request threads
+    (the threaded dev server can run several at once).
+    """
+    cascade = get_cascade()
+    with _detect_lock:
+        return cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5)
+
+def load_model(model_path: str, label_map_path: str):
+    """
+    Return (recognizer, label_map, version) for a trained LBPH model, or (None, {}, None)
+    if it has not been trained yet. Models are cached per path and re-read only when
+    the files on disk change (e.g. after /api/v1/train); version identifies the loaded
+    files and invalidates cached recognition results on reload.
+    """
+    try:
+        mtime = (os.stat(model_path).st_mtime_ns, os.stat(label_map_path).st_mtime_ns)
+    except OSError:
+        return None, {}, None
+
+    entry = _models.get(model_path)
+    if entry is None or entry["mtime"] != mtime:
+        with _resource_lock:
+            entry = _models.get(model_path)
+            if entry is None or entry["mtime"] != mtime:
+                with open(label_map_path, "r", encoding="utf-8") as f:
+                    label_map = json.load(f)
+                recognizer = cv2.face.LBPHFaceRecognizer_create()
+                recognizer.read(model_path)
+                entry = {"mtime": mtime, "recognizer": recognizer, "label_map": label_map}
+                _models[model_path] = entry
+                if recognition_cache is not None:
+                    recognition_cache.invalidate(model_path)
+                logger.info(f"Loaded model {model_path} ({len(label_map)} labels)")
+    return entry["recognizer"], entry["label_map"], (model_path, entry["mtime"])
+
+def warmup() -> int:
+    """
+    Preload the cascade, the default model and every trained cohort model, and run one
+    detection + one prediction per model on a synthetic frame so the first real request
+    (including from a kiosk pinned to a cohort) doesn't pay for lazy initialization.
+    Returns warmup duration in ms.
+    """
+    start = time.perf_counter()
+    get_cascade()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(480, 640), dtype=np.uint8)
+    detect_faces(frame)
+    face_img = cv2.resize(frame[:200, :200], (200, 200))
+
+    recognizer, _, _ = load_model(app.config["MODEL_PATH"], app.config["LABEL_MAP_PATH"])
+    if recognizer is not None:
+        recognizer.predict(face_img)
+
+    cohort_models = 0
+    for cohort in cohort_memberships():
+        cohort_recognizer, _, _ = load_model(*model_paths(cohort))
+        if cohort_recognizer is not None:
+            cohort_recognizer.predict(face_img)
+            cohort_models += 1
+
+    _readiness["model_loaded"] = recognizer is not None
+    _readiness["cohort_models_loaded"] = cohort_models
+    return int((time.perf_counter() - start) * 1000)
+
 def base64_to_cv2(image_data):
     """
     Convert base64 image string to OpenCV image (numpy array).
@@ -100,11 +297,78 @@ def landing():
 def dashboard():
     return render_template("dashboard.html")
 
+# -------------------- Request Timing --------------------
+_UNTIMED_ENDPOINTS = {"health", "ready", "stats", "static", "favicon"}
+# first_recognition_ms is taken from the first successful one of these, to check the warmup paid off
+_RECOGNITION_ENDPOINTS = {"process_frame", "api_verify_crops"}
+
+@app.before_request
+def _mark_request_start():
+    g.request_started = time.perf_counter()
+    g.event = {"stages": {}}
+
+def record_stage(name: str, started: float) -> float:
+    """
+    Add the ms elapsed since `started` to this request's event stage timings.
+    Returns the current time so stages can be chained.
+    """
+    now = time.perf_counter()
+    stages = g.event["stages"]
+    stages[name] = round(stages.get(name, 0.0) + (now - started) * 1000, 2)
+    return now
+
+@app.after_request
+def _record_first_recognition(response):
+    if (
+        _readiness["first_recognition_ms"] is None
+        and request.endpoint in _RECOGNITION_ENDPOINTS
+        and response.status_code < 400
+    ):
+        started = getattr(g, "request_started", None)
+        if started is not None:
+            _readiness["first_recognition_ms"] = int((time.perf_counter() - started) * 1000)
+            logger.info(f"First recognition request ({request.endpoint}) took {_readiness['first_recognition_ms']}ms")
+    return response
+
+@app.after_request
+def _log_request_event(response):
+    if event_log is None or request.endpoint in _UNTIMED_ENDPOINTS:
+        return response
+    started = getattr(g, "request_started", None)
+    event = getattr(g, "event", {})
+    record = {
+        "ts": time.time(),
+        "endpoint": request.endpoint or request.path,
+        "method": request.method,
+        "status": response.status_code,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2) if started is not None else None,
+        "worker": os.getpid(),
+        **{k: v for k, v in event.items() if v is not None and v != {}},
+    }
+    event_log.log(record)
+    return response
+
 # -------------------- API (v1) --------------------
+@app.route("/api/v1/stats")
+def stats():
+    """Runtime counters (recognition cache hit rate etc.)."""
+    return jsonify({
+        "ok": True,
+        "worker": os.getpid(),
+        "recognition_cache": recognition_cache.stats() if recognition_cache is not None else None,
+    })
+
 @app.route("/api/v1/health")
 def health():
+    """Liveness: the process is up and serving requests."""
     return jsonify({"ok": True, "service": "face_reward", "version": "v1"})
 
+@app.route("/api/v1/ready")
+def ready():
+    """Readiness: DB initialized and detector/model warmed up."""
+    status = 200 if _readiness["ready"] else 503
+    return jsonify({"ok": _readiness["ready"], **_readiness}), status
+
 @app.route("/api/v1/users", methods=["GET"])
 def api_users_list():
     con = db()
@@ -114,6 +378,51 @@ def api_users_list():
     con.close()
     return jsonify({"ok": True, "users": rows})
 
+@app.route("/api/v1/cohorts", methods=["GET"])
+def api_cohorts_list():
+    cohorts = [{"name": name, "members": members} for name, members in cohort_memberships().items()]
+    return jsonify({"ok": True, "cohorts": cohorts})
+
+@app.route("/api/v1/cohorts", methods=["POST"])
+def api_cohorts_upsert():
+    """
+    Create a cohort. If "users" is given, the cohort's membership is set to exactly those users.
+    """
+    data = request.get_json(force=True) or {}
+    try:
+        names = parse_cohort_names(data.get("name"))
+    except ValueError as e:
+        return json_error(str(e))
+    if len(names) != 1:
+        return json_error("A single cohort name is required")
+    cohort = names[0]
+    users = data.get("users")
+    if users is not None and (not isinstance(users, list) or not all(isinstance(u, str) for u in users)):
+        return json_error("users must be a list of names")
+
+    con = db()
+    cur = con.cursor()
+    try:
+        cur.execute("INSERT OR IGNORE INTO cohorts(name) VALUES(?)", (cohort,))
+        if users is not None:
+            users = [u.strip() for u in users]
+            placeholders = ",".join("?" * len(users))
+            cur.execute(f"SELECT name FROM users WHERE name IN ({placeholders})", users)
+            missing = sorted(set(users) - {r["name"] for r in cur.fetchall()})
+            if missing:
+                return json_error(f"Unknown users: {', '.join(missing)}", 404)
+            cur.execute("DELETE FROM user_cohorts WHERE cohort_id=(SELECT id FROM cohorts WHERE name=?)", (cohort,))
+            for user in users:
+                add_user_to_cohorts(cur, user, [cohort])
+        con.commit()
+    except sqlite3.Error as db_err:
+        logger.error(f"Database error updating cohort {cohort}: {db_err}")
+        return json_error("Database persistence failed", 500)
+    finally:
+        con.close()
+
+    return jsonify({"ok": True, "name": cohort, "members": cohort_memberships().get(cohort, [])})
+
 
 
 @app.route("/api/v1/register", methods=["POST"])
@@ -140,6 +449,11 @@ def api_register():
     if not image_data:
          return json_error("Image data required for registration", 400)
 
+    try:
+        cohorts = parse_cohort_names(data.get("cohorts"))
+    except ValueError as e:
+        return json_error(str(e))
+
     try:
         # 2. Directory Management
         user_dir = os.path.join(app.config["FACES_DIR"], name)
@@ -151,8 +465,7 @@ def api_register():
             return json_error("Invalid image data")
 
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5)
+        faces = detect_faces(gray)
         
         saved_count = 0
         out_path = None
@@ -189,6 +502,7 @@ def api_register():
                 cur.execute("UPDATE users SET email=? WHERE name=?", (email, name))
             if out_path:
                 cur.execute("UPDATE users SET image_path=? WHERE name=?", (out_path, name))
+            add_user_to_cohorts(cur, name, cohorts)
             con.commit()
             logger.info(f"Database entry updated for user: {name}")
         except sqlite3.Error as db_err:
@@ -208,54 +522,39 @@ def api_register():
         logger.error(f"Unexpected error during registration: {e}", exc_info=True)
         return json_error("Internal server error during registration", 500)
 
-@app.route("/process_frame", methods=["POST"])
-def process_frame():
+def predict_face(recognizer, face_img, model_version=None):
     """
-    Process a single frame for verification or just detection.
+    recognizer.predict() with a short-lived cache for near-identical crops (dHash within a
+    few bits and a matching thumbnail), e.g. a person standing still at a kiosk.
+    Returns (label, distance).
+    """
+    if recognition_cache is None or model_version is None:
+        return recognizer.predict(face_img)
+
+    fingerprint, thumb = crop_fingerprint(face_img), crop_thumbnail(face_img)
+    cached = recognition_cache.lookup(model_version, fingerprint, thumb)
+    if cached is not None:
+        g.event["cache_hits"] = g.event.get("cache_hits", 0) + 1
+        return cached
+    g.event["cache_misses"] = g.event.get("cache_misses", 0) + 1
+    label, dist = recognizer.predict(face_img)
+    recognition_cache.put(model_version, fingerprint, thumb, (label, dist))
+    return label, dist
+
+def recognize_faces(gray, faces, recognizer, label_map, threshold, offset=(0, 0), scale=1.0, model_version=None):
+    """
+    Run recognition on detected face boxes in a grayscale image.
+    offset/scale map boxes from a (resized) crop back to original frame coordinates.
+    Returns (results, best_match).
     """
-    start_time = time.time()
-    data = request.get_json(force=True) or {}
-    image_data = data.get("image")
-    threshold = float(data.get("threshold") or 75.0)
-
-    if not image_data:
-        return json_error("No image data provided")
-
-    frame = base64_to_cv2(image_data)
-    if frame is None:
-        return json_error("Invalid image")
-
-    # Load Model Resources
-    model_path = app.config["MODEL_PATH"]
-    label_map_path = app.config["LABEL_MAP_PATH"]
-    
-    # Check if model exists (for graceful fallback to just detection)
-    model_ready = os.path.exists(model_path) and os.path.exists(label_map_path)
-
-    # Prepare Recognizer & Cascade
-    try:
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-        
-        recognizer = None
-        label_map = {}
-        if model_ready:
-            with open(label_map_path, "r", encoding="utf-8") as f:
-                label_map = json.load(f)
-            recognizer = cv2.face.LBPHFaceRecognizer_create()
-            recognizer.read(model_path)
-    except Exception as e:
-        return json_error(f"Error initializing detector: {str(e)}", 500)
-
-    # Detect and Recognize
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5)
-    
     results = []
     best_match = {"matched": False, "name": None, "confidence": None}
+    ox, oy = offset
 
     for (x, y, w, h) in faces:
         res = {
-            "x": int(x), "y": int(y), "w": int(w), "h": int(h),
+            "x": int(ox + x / scale), "y": int(oy + y / scale),
+            "w": int(w / scale), "h": int(h / scale),
             "label": "Face",
             "confidence": 0,
             "matched": False
@@ -264,7 +563,7 @@ def process_frame():
         if recognizer:
             face_img = gray[y:y+h, x:x+w]
             face_img = cv2.resize(face_img, (200, 200))
-            label, dist = recognizer.predict(face_img)
+            label, dist = predict_face(recognizer, face_img, model_version)
             name = label_map.get(str(label), "unknown")
             matched = dist <= threshold and name != "unknown"
             
@@ -277,7 +576,17 @@ def process_frame():
 
         results.append(res)
 
+    return results, best_match
+
+def recognition_response(results, best_match, start_time):
     processing_ms = int((time.time() - start_time) * 1000)
+    distances = [r["confidence"] for r in results if r["label"] != "Face"]
+    g.event.update(
+        faces=len(results),
+        matched=best_match["matched"],
+        name=best_match["name"],
+        distance=best_match["confidence"] if best_match["matched"] else min(distances, default=None),
+    )
 
     return jsonify({
         "ok": True,
@@ -289,32 +598,168 @@ def process_frame():
         "processing_ms": processing_ms
     })
 
+@app.route("/process_frame", methods=["POST"])
+def process_frame():
+    """
+    Process a single frame for verification or just detection.
+    """
+    start_time = time.time()
+    data = request.get_json(force=True) or {}
+    image_data = data.get("image")
+    threshold = float(data.get("threshold") or 75.0)
+    try:
+        cohort = (parse_cohort_names(data.get("cohort")) or [None])[0]
+    except ValueError as e:
+        return json_error(str(e))
+    g.event["cohort"] = cohort
+
+    if not image_data:
+        return json_error("No image data provided")
+
+    t = time.perf_counter()
+    frame = base64_to_cv2(image_data)
+    if frame is None:
+        return json_error("Invalid image")
+    t = record_stage("decode", t)
+
+    # Prepare Recognizer & Cascade (cached; without a cohort, recognizer is None until the
+    # global model is trained, which gracefully falls back to just detection)
+    try:
+        get_cascade()
+        recognizer, label_map, model_version = load_model(*model_paths(cohort))
+    except Exception as e:
+        return json_error(f"Error initializing detector: {str(e)}", 500)
+    if cohort and recognizer is None:
+        return json_error(f"No trained model for cohort '{cohort}'", 404)
+    t = record_stage("load_model", t)
+
+    # Detect and Recognize
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    faces = detect_faces(gray)
+    t = record_stage("detect", t)
+    results, best_match = recognize_faces(
+        gray, faces, recognizer, label_map, threshold, model_version=model_version
+    )
+    record_stage("recognize", t)
+
+    return recognition_response(results, best_match, start_time)
+
+MAX_CROPS = 8
+
+@app.route("/api/v1/verify_crops", methods=["POST"])
+def api_verify_crops():
+    """
+    Verify face crops cut out by the browser instead of a whole frame.
+    Body: {"crops": [{"image": base64, "x": int, "y": int, "scale": float}], "threshold", "cohort"}
+    (x, y) is the crop's offset in the original frame and scale the factor the browser resized
+    it by. Detection only runs inside each small, padded crop to tighten the face box, then
+    recognition runs as in /process_frame. Boxes are returned in frame coordinates.
+    """
+    start_time = time.time()
+    data = request.get_json(force=True) or {}
+    crops = data.get("crops") or []
+    threshold = float(data.get("threshold") or 75.0)
+    try:
+        cohort = (parse_cohort_names(data.get("cohort")) or [None])[0]
+    except ValueError as e:
+        return json_error(str(e))
+    g.event["cohort"] = cohort
+
+    if not crops or not isinstance(crops, list):
+        return json_error("No crops provided")
+    if len(crops) > MAX_CROPS:
+        return json_error(f"Too many crops (max {MAX_CROPS})")
+
+    t = time.perf_counter()
+    try:
+        get_cascade()
+        recognizer, label_map, model_version = load_model(*model_paths(cohort))
+    except Exception as e:
+        return json_error(f"Error initializing detector: {str(e)}", 500)
+    if cohort and recognizer is None:
+        return json_error(f"No trained model for cohort '{cohort}'", 404)
+    record_stage("load_model", t)
+
+    g.event["crops"] = len(crops)
+    results = []
+    best_match = {"matched": False, "name": None, "confidence": None}
+    for crop in crops:
+        if not isinstance(crop, dict):
+            return json_error("Invalid crop")
+        t = time.perf_counter()
+        image = base64_to_cv2(crop.get("image") or "")
+        if image is None:
+            return json_error("Invalid crop image")
+        t = record_stage("decode", t)
+        try:
+            offset = (int(crop.get("x") or 0), int(crop.get("y") or 0))
+            scale = float(crop.get("scale") or 1.0)
+        except (TypeError, ValueError):
+            return json_error("Invalid crop offset/scale")
+        if scale <= 0:
+            return json_error("Invalid crop offset/scale")
+
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = detect_faces(gray)
+        t = record_stage("detect", t)
+        crop_results, crop_best = recognize_faces(
+            gray, faces, recognizer, label_map, threshold, offset=offset, scale=scale,
+            model_version=model_version,
+        )
+        record_stage("recognize", t)
+        results.extend(crop_results)
+        if crop_best["matched"] and (best_match["confidence"] is None or crop_best["confidence"] < best_match["confidence"]):
+            best_match = crop_best
+
+    return recognition_response(results, best_match, start_time)
+
 @app.route("/api/v1/train", methods=["POST"])
 def api_train():
+    from src.train_model import train_model, train_cohort_models
+
+    data = request.get_json(silent=True) or {}
     try:
         summary = train_model(
             faces_dir=app.config["FACES_DIR"],
             model_path=app.config["MODEL_PATH"],
             label_map_path=app.config["LABEL_MAP_PATH"],
         )
+        cohorts = train_cohort_models(
+            faces_dir=app.config["FACES_DIR"],
+            cohorts_dir=app.config["COHORT_MODELS_DIR"],
+            cohorts=cohort_memberships(),
+            force=bool(data.get("force")),
+        )
     except Exception as e:
         return json_error(str(e), 500)
 
-    return jsonify({"ok": True, "message": "Model trained", "details": summary})
+    return jsonify({"ok": True, "message": "Model trained", "details": summary, "cohorts": cohorts})
 
 @app.route("/api/v1/verify", methods=["POST"])
 def api_verify():
     data = request.get_json(force=True) or {}
     threshold = float(data.get("threshold") or 75.0)
+    try:
+        cohort = (parse_cohort_names(data.get("cohort")) or [None])[0]
+    except ValueError as e:
+        return json_error(str(e))
+    from src.verify_face import verify_face
+
+    model_path, label_map_path = model_paths(cohort)
+    if cohort and not os.path.exists(model_path):
+        return json_error(f"No trained model for cohort '{cohort}'", 404)
     try:
         result = verify_face(
-            model_path=app.config["MODEL_PATH"],
-            label_map_path=app.config["LABEL_MAP_PATH"],
+            model_path=model_path,
+            label_map_path=label_map_path,
             threshold=threshold,
         )
     except Exception as e:
         return json_error(str(e), 500)
 
+    g.event.update(
+        cohort=cohort, faces=1, matched=result["matched"], name=result["name"], distance=result["confidence"]
+    )
     return jsonify({"ok": True, **result})
 
 
@@ -341,8 +786,17 @@ with app.app_context():
     try:
         ensure_dirs()
         init_db()
-        logger.info("Application context initialization complete.")
+        if app.config["WARMUP_ON_START"]:
+            _readiness["warmup_ms"] = warmup()
+        _readiness["ready"] = True
+        _readiness["startup_ms"] = int((time.perf_counter() - _IMPORT_STARTED) * 1000)
+        logger.info(
+            f"Application context initialization complete in {_readiness['startup_ms']}ms "
+            f"(warmup {_readiness['warmup_ms']}ms, model loaded: {_readiness['model_loaded']}, "
+            f"cohort models: {_readiness['cohort_models_loaded']})."
+        )
     except Exception as init_err:
+        _readiness["error"] = str(init_err)
         logger.error(f"Fatal error during initialization: {init_err}")
 
 if __name__ == "__main__":
@@ -1,7 +1,15 @@
 import os
+from typing import Tuple
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+def cohort_model_paths(cohorts_dir: str, cohort: str) -> Tuple[str, str]:
+    """
+    Return (model_path, label_map_path) for a cohort's model under cohorts_dir.
+    """
+    cohort_dir = os.path.join(cohorts_dir, cohort)
+    return os.path.join(cohort_dir, "lbph_model.xml"), os.path.join(cohort_dir, "label_map.json")
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev_secret_change_me")
     DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -11,6 +19,28 @@ class Config:
     MODELS_DIR = os.path.join(BASE_DIR, "models")
     MODEL_PATH = os.path.join(MODELS_DIR, "lbph_model.xml")
     LABEL_MAP_PATH = os.path.join(MODELS_DIR, "label_map.json")
+    # One model per cohort: COHORT_MODELS_DIR/<cohort>/lbph_model.xml + label_map.json
+    COHORT_MODELS_DIR = os.path.join(MODELS_DIR, "cohorts")
+
+    # Preload cascade/model and run a warmup inference at startup
+    WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "1") == "1"
+
+    # Buffered per-request JSONL log (logs/events.<pid>.jsonl), see src/event_log.py
+    EVENT_LOG_ENABLED = os.environ.get("EVENT_LOG_ENABLED", "1") == "1"
+    EVENT_LOG_DIR = os.path.join(BASE_DIR, "logs")
+    EVENT_LOG_QUEUE_SIZE = int(os.environ.get("EVENT_LOG_QUEUE_SIZE", "10000"))
+    EVENT_LOG_MAX_BYTES = int(os.environ.get("EVENT_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    EVENT_LOG_MAX_AGE = int(os.environ.get("EVENT_LOG_MAX_AGE", str(24 * 3600)))
+    # Rotated files kept per worker, and age after which other workers' files are removed
+    EVENT_LOG_BACKUPS = int(os.environ.get("EVENT_LOG_BACKUPS", "10"))
+    EVENT_LOG_RETENTION = int(os.environ.get("EVENT_LOG_RETENTION", str(7 * 24 * 3600)))
+
+    # Cache of recognition results for near-identical face crops (0 disables)
+    RECOGNITION_CACHE_SIZE = int(os.environ.get("RECOGNITION_CACHE_SIZE", "1024"))
+    RECOGNITION_CACHE_TTL = float(os.environ.get("RECOGNITION_CACHE_TTL", "5"))
+    # Near-duplicate match: dHash Hamming distance and mean thumbnail difference (gray levels)
+    RECOGNITION_CACHE_MAX_BITS = int(os.environ.get("RECOGNITION_CACHE_MAX_BITS", "6"))
+    RECOGNITION_CACHE_MAX_DIFF = float(os.environ.get("RECOGNITION_CACHE_MAX_DIFF", "6"))
 
     CERT_DIR = os.path.join(DATA_DIR, "certificates")
 
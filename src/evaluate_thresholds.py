@@ -0,0 +1,455 @@
+"""
+Offline threshold calibration over the data/faces gallery.
+
+LBPH predict() returns the chi-square distance (HISTCMP_CHISQR_ALT) from the probe's
+histogram to the nearest training histogram. We reproduce that in bulk: every crop is
+used as a leave-one-out probe against all other crops, reduced to its nearest distance
+per person. From those we get, for any model (global or cohort):
+  - genuine score:  nearest distance to the probe's own person (excluding itself)
+  - impostor score: nearest distance to anyone else in the model
+and sweep thresholds to produce FAR/FRR curves (ROC = FAR vs 1 - FRR).
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+# Worker globals (set by _init_worker)
+_W = {}
+
+def _gallery(faces_dir: str) -> Tuple[List[str], List[str]]:
+    """
+    Return (image_paths, person_names) for every crop, sorted by person then file.
+    """
+    paths, people = [], []
+    for person_name in sorted(os.listdir(faces_dir)):
+        person_dir = os.path.join(faces_dir, person_name)
+        if not os.path.isdir(person_dir):
+            continue
+        for img_name in sorted(os.listdir(person_dir)):
+            if img_name.lower().endswith(IMAGE_EXTS):
+                paths.append(os.path.join(person_dir, img_name))
+                people.append(person_name)
+    return paths, people
+
+def _file_key(faces_dir: str, path: str) -> str:
+    st = os.stat(path)
+    return f"{os.path.relpath(path, faces_dir)}|{st.st_size}|{st.st_mtime_ns}"
+
+def _lbph_dim() -> int:
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    return recognizer.getGridX() * recognizer.getGridY() * (2 ** recognizer.getNeighbors())
+
+def _lbph_histograms(paths: List[str], out: np.ndarray, rows: List[int], chunk: int = 1000):
+    """
+    Write the LBPH spatial histogram of paths[k] into out[rows[k]], computed exactly as the
+    recognizer does (default radius, neighbors and 8x8 grid) by training a throwaway model
+    per chunk of images and reading them back. Unreadable images get an all-zero row.
+    """
+    for s in range(0, len(paths), chunk):
+        imgs, ok = [], []
+        for path, row in zip(paths[s:s + chunk], rows[s:s + chunk]):
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                out[row] = 0
+                continue
+            imgs.append(cv2.resize(img, (200, 200)))
+            ok.append(row)
+        if imgs:
+            recognizer = cv2.face.LBPHFaceRecognizer_create()
+            recognizer.train(imgs, np.zeros(len(imgs), dtype=np.int32))
+            for row, hist in zip(ok, recognizer.getHistograms()):
+                out[row] = hist.reshape(-1)
+
+def load_features(faces_dir: str, paths: List[str], cache_dir: Optional[str], chunk: int = 1000) -> np.ndarray:
+    """
+    Return an (N, D) float32 histogram matrix for paths, reusing cached rows for
+    files whose (path, size, mtime) are unchanged.
+
+    Rows are filled into one preallocated array, from the memory-mapped cache or in chunks
+    of fresh histograms, so peak memory is the matrix plus one chunk of images.
+    """
+    keys = [_file_key(faces_dir, p) for p in paths]
+    feats = np.zeros((len(paths), _lbph_dim()), dtype=np.float32)
+    missing = list(range(len(paths)))
+
+    index_path = os.path.join(cache_dir, "histograms.json") if cache_dir else None
+    if index_path and os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        cached_path = os.path.join(cache_dir, index["file"])
+        if os.path.exists(cached_path):
+            cached = np.load(cached_path, mmap_mode="r")
+            row_of = {k: r for r, k in enumerate(index["keys"])}
+            hit = [i for i, k in enumerate(keys) if k in row_of]
+            if cached.shape == (len(row_of), feats.shape[1]):
+                for s in range(0, len(hit), chunk):
+                    idx = hit[s:s + chunk]
+                    feats[idx] = cached[[row_of[keys[i]] for i in idx]]
+                missing = [i for i, k in enumerate(keys) if k not in row_of]
+            del cached
+
+    _lbph_histograms([paths[i] for i in missing], feats, missing, chunk)
+
+    if index_path and missing:
+        # Content-addressed file, then swap the index, so a crash never pairs keys with the wrong rows
+        os.makedirs(cache_dir, exist_ok=True)
+        keys_hash = hashlib.sha1("\n".join(keys).encode("utf-8")).hexdigest()
+        name = f"histograms_{keys_hash[:16]}.npy"
+        np.save(os.path.join(cache_dir, name), feats)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"file": name, "keys": keys}, f)
+        os.replace(tmp_path, index_path)
+        for old in os.listdir(cache_dir):
+            if (old.startswith("histograms_") and old != name) or old == "features.npz":
+                os.remove(os.path.join(cache_dir, old))
+    return feats
+
+def _init_worker(feats_path: str, sqrt_path: Optional[str], labels: np.ndarray,
+                 class_starts: np.ndarray, top_m: Optional[int], exact: bool):
+    # Memory-mapped so all workers share one copy through the page cache
+    _W["feats"] = np.load(feats_path, mmap_mode="r")
+    _W["row_sums"] = np.asarray(_W["feats"]).sum(axis=1)
+    _W["sqrt"] = np.load(sqrt_path, mmap_mode="r") if sqrt_path else None
+    _W["labels"] = labels
+    _W["class_starts"] = class_starts
+    _W["top_m"] = top_m
+    _W["exact"] = exact
+
+def _chi2_alt(a: np.ndarray, feats: np.ndarray, idx: np.ndarray, chunk: int = 32) -> np.ndarray:
+    """
+    LBPH distance from histogram a to feats[idx], same as predict():
+      HISTCMP_CHISQR_ALT = 2 * sum((a - b)^2 / (a + b))
+    Computed in small row chunks so the temporaries stay in cache.
+    """
+    out = np.empty(len(idx), dtype=np.float32)
+    for s in range(0, len(idx), chunk):
+        rows = np.asarray(feats[idx[s:s + chunk]])
+        num = rows - a
+        np.square(num, out=num)
+        den = rows + a
+        np.maximum(den, 1e-30, out=den)  # bins empty in both: 0 / tiny = 0
+        np.divide(num, den, out=num)
+        out[s:s + chunk] = 2.0 * num.sum(axis=1)
+    return out
+
+def _class_min_block(bounds: Tuple[int, int]) -> np.ndarray:
+    """
+    For probes [start, stop): nearest LBPH distance to each person (self excluded).
+
+    With top_m set, exact distances are only computed for a shortlist ranked by the
+    Hellinger distance H2 = sum(a) + sum(b) - 2 * sqrt(a).sqrt(b), which is one GEMM per
+    block and bounds chi-square (2*H2 <= chi2_alt <= 4*H2): the probe's own person, each
+    other person's H2-nearest crop, and the top_m H2-nearest crops overall. The own-person
+    entry is exact; another person's entry can be too high when their chi-square-nearest
+    crop isn't their H2-nearest. With exact set, every other crop whose lower bound 2*H2 is
+    below its person's best so far is rescored as well, which makes every entry exact.
+    """
+    start, stop = bounds
+    feats, labels, starts, top_m = _W["feats"], _W["labels"], _W["class_starts"], _W["top_m"]
+    n, p = len(labels), len(starts)
+    ends = np.append(starts[1:], n)
+    out = np.full((stop - start, p), np.inf, dtype=np.float32)
+
+    if top_m is not None:
+        sq, sums = _W["sqrt"], _W["row_sums"]
+        h2 = sums[start:stop, None] + sums[None, :] - 2.0 * (np.asarray(sq[start:stop]) @ np.asarray(sq).T)
+
+    for k, i in enumerate(range(start, stop)):
+        own = labels[i]
+        if top_m is None:
+            cand = np.arange(n)
+        else:
+            h = h2[k]
+            h[i] = np.inf
+            nearest_per_class = np.flatnonzero(h == np.minimum.reduceat(h, starts)[labels])
+            top = np.argpartition(h, top_m)[:top_m] if n > top_m else np.arange(n)
+            cand = np.unique(np.concatenate([np.arange(starts[own], ends[own]), nearest_per_class, top]))
+        cand = cand[cand != i]
+        if len(cand):
+            np.minimum.at(out[k], labels[cand], _chi2_alt(np.asarray(feats[i]), feats, cand))
+        if top_m is not None and _W["exact"]:
+            # Slack covers float32 rounding in the GEMM; h[i] is inf so self never qualifies
+            bound = 2.0 * h - 1e-4 * (sums[i] + sums)
+            extra = np.setdiff1d(np.flatnonzero(bound < out[k][labels]), cand, assume_unique=True)
+            if len(extra):
+                np.minimum.at(out[k], labels[extra], _chi2_alt(np.asarray(feats[i]), feats, extra))
+    return out
+
+def class_distance_matrix(
+    feats: np.ndarray,
+    labels: np.ndarray,
+    work_dir: str,
+    workers: Optional[int] = None,
+    top_m: Optional[int] = 32,
+    exact: bool = False,
+    block_size: int = 64,
+) -> np.ndarray:
+    """
+    Leave-one-out distance matrix reduced per person: (N probes, P people), where
+    entry [i, p] is the LBPH distance from crop i to the nearest other crop of person p.
+    labels must be sorted (each person's crops contiguous).
+
+    top_m=None scores every pair. Otherwise a Hellinger shortlist is rescored, which is
+    approximate: entries for other people can come out too high (never too low), so FAR
+    is slightly underestimated. exact=True also rescores every crop the Hellinger bound
+    can't rule out, giving the same matrix as top_m=None (see _class_min_block).
+    Probes are split into blocks and processed across cores.
+    """
+    n = feats.shape[0]
+    class_starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    os.makedirs(work_dir, exist_ok=True)
+    feats_path = os.path.join(work_dir, "features.npy")
+    feats = np.ascontiguousarray(feats, dtype=np.float32)
+    np.save(feats_path, feats)
+    sqrt_path = None
+    if top_m is not None:
+        # Streamed in chunks so there is never a second in-memory N x D copy
+        sqrt_path = os.path.join(work_dir, "features_sqrt.npy")
+        with open(sqrt_path, "wb") as f:
+            np.lib.format.write_array_header_1_0(f, np.lib.format.header_data_from_array_1_0(feats))
+            for s in range(0, n, 1000):
+                f.write(np.sqrt(feats[s:s + 1000]).tobytes())
+
+    blocks = [(s, min(s + block_size, n)) for s in range(0, n, block_size)]
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(feats_path, sqrt_path, labels, class_starts, top_m, exact),
+        ) as pool:
+            parts = list(pool.map(_class_min_block, blocks))
+    finally:
+        for path in (feats_path, sqrt_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+    return np.vstack(parts) if parts else np.zeros((0, len(class_starts)), np.float32)
+
+def _rate_at(sorted_scores: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    """Fraction of scores <= each threshold (matches LBPH 'dist <= threshold')."""
+    if len(sorted_scores) == 0:
+        return np.zeros(len(thresholds))
+    return np.searchsorted(sorted_scores, thresholds, side="right") / len(sorted_scores)
+
+def evaluate_model(
+    class_dist: np.ndarray,
+    probe_labels: np.ndarray,
+    model_classes: np.ndarray,
+    target_far: float = 0.01,
+    current_threshold: float = 75.0,
+    step: float = 0.5,
+) -> Dict[str, Any]:
+    """
+    FAR/FRR over thresholds for a model trained on model_classes.
+
+    Members of the model contribute a genuine attempt (accepted if their own person is the
+    nearest match and within threshold) and a leave-one-out impostor attempt (nearest other
+    member). Non-members (e.g. people outside a cohort) contribute impostor attempts only.
+    """
+    sub = class_dist[:, model_classes].astype(np.float64)
+    col_of = np.full(class_dist.shape[1], -1)
+    col_of[model_classes] = np.arange(len(model_classes))
+    pos = col_of[probe_labels]
+    member = pos >= 0
+
+    rows = np.flatnonzero(member)
+    genuine = np.full(len(probe_labels), np.inf)
+    genuine[rows] = sub[rows, pos[rows]]
+    sub[rows, pos[rows]] = np.inf
+    impostor = sub.min(axis=1) if sub.shape[1] else np.full(len(probe_labels), np.inf)
+
+    gen_mask = member & np.isfinite(genuine)
+    gen_correct = np.sort(genuine[gen_mask & (genuine <= impostor)])
+    imp_scores = np.sort(impostor[np.isfinite(impostor)])
+    n_gen = int(gen_mask.sum())
+
+    finite = np.concatenate([genuine[gen_mask], imp_scores])
+    max_t = float(np.ceil(finite.max())) if len(finite) else current_threshold
+    thresholds = np.arange(0.0, max(max_t, current_threshold) + step, step)
+
+    def frr_at(t: np.ndarray) -> np.ndarray:
+        if not n_gen:
+            return np.zeros(len(t))
+        return 1.0 - np.searchsorted(gen_correct, t, side="right") / n_gen
+
+    far = _rate_at(imp_scores, thresholds)
+    frr = frr_at(thresholds)
+
+    eer_idx = int(np.argmin(np.abs(far - frr)))
+    ok = np.flatnonzero(far <= target_far)
+    rec_idx = int(ok[-1]) if len(ok) else 0
+    cur = np.array([current_threshold])
+
+    return {
+        "people": int(len(model_classes)),
+        "genuine_attempts": n_gen,
+        "impostor_attempts": int(len(imp_scores)),
+        "rank1_accuracy": float(len(gen_correct) / n_gen) if n_gen else None,
+        "eer": float((far[eer_idx] + frr[eer_idx]) / 2),
+        "eer_threshold": float(thresholds[eer_idx]),
+        "target_far": target_far,
+        "recommended_threshold": float(thresholds[rec_idx]),
+        "far_at_recommended": float(far[rec_idx]),
+        "frr_at_recommended": float(frr[rec_idx]),
+        "current": {
+            "threshold": current_threshold,
+            "far": float(_rate_at(imp_scores, cur)[0]),
+            "frr": float(frr_at(cur)[0]),
+        },
+        "curve": {
+            "thresholds": thresholds.round(3).tolist(),
+            "far": far.round(6).tolist(),
+            "frr": frr.round(6).tolist(),
+        },
+    }
+
+def load_cohorts(db_path: str) -> Dict[str, List[str]]:
+    """
+    Read {cohort: [user names]} from the app database (empty if it has no cohorts yet).
+    """
+    if not db_path or not os.path.exists(db_path):
+        return {}
+    con = sqlite3.connect(db_path)
+    try:
+        rows = con.execute("""
+            SELECT c.name, u.name FROM cohorts c
+            JOIN user_cohorts uc ON uc.cohort_id = c.id
+            JOIN users u ON u.id = uc.user_id
+        """).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        con.close()
+    cohorts: Dict[str, List[str]] = {}
+    for cohort, user in rows:
+        cohorts.setdefault(cohort, []).append(user)
+    return cohorts
+
+def evaluate_thresholds(
+    faces_dir: str,
+    cache_dir: Optional[str] = None,
+    cohorts: Optional[Dict[str, List[str]]] = None,
+    target_far: float = 0.01,
+    current_threshold: float = 75.0,
+    workers: Optional[int] = None,
+    exact: bool = False,
+) -> Dict[str, Any]:
+    """
+    Evaluate the global model and each cohort model over the faces gallery.
+
+    Histograms and the per-person distance matrix are cached in cache_dir and reused
+    while the gallery is unchanged. By default impostor distances come from a Hellinger
+    shortlist and can be slightly too high (see class_distance_matrix); exact=True rescores
+    every crop the Hellinger bound can't rule out, which is exact but can approach
+    scoring every pair on large galleries. The report's "exact" field records which.
+
+    Returns {"images", "people", "exact", "timings_ms", "global": {...}, "cohorts": {"<cohort>": {...}}}.
+    """
+    timings: Dict[str, int] = {}
+    t0 = time.perf_counter()
+
+    paths, people = _gallery(faces_dir)
+    if not paths:
+        raise RuntimeError(f"No images found in {faces_dir}. Register faces first.")
+    names = sorted(set(people))
+    label_of = {name: i for i, name in enumerate(names)}
+    # Gallery is sorted by person, so each person's crops are contiguous
+    probe_labels = np.array([label_of[p] for p in people])
+
+    top_m = 32
+    settings = [f"top_m={top_m}", f"exact={exact}"]
+    gallery_hash = hashlib.sha1(
+        "\n".join(settings + [_file_key(faces_dir, p) for p in paths]).encode("utf-8")
+    ).hexdigest()
+    dist_path = os.path.join(cache_dir, f"class_dist_{gallery_hash[:16]}.npy") if cache_dir else None
+    if dist_path and os.path.exists(dist_path):
+        class_dist = np.load(dist_path)
+        timings["features"] = 0
+        t1 = time.perf_counter()
+    else:
+        # Histograms are only needed to (re)build the distance matrix
+        feats = load_features(faces_dir, paths, cache_dir)
+        timings["features"] = int((time.perf_counter() - t0) * 1000)
+        t1 = time.perf_counter()
+        work_dir = cache_dir or tempfile.mkdtemp(prefix="face_eval_")
+        class_dist = class_distance_matrix(
+            feats, probe_labels, work_dir, workers=workers, top_m=top_m, exact=exact)
+        del feats
+        if not cache_dir:
+            os.rmdir(work_dir)
+        if dist_path:
+            for old in os.listdir(cache_dir):
+                if old.startswith("class_dist_"):
+                    os.remove(os.path.join(cache_dir, old))
+            np.save(dist_path, class_dist)
+    timings["distances"] = int((time.perf_counter() - t1) * 1000)
+
+    t2 = time.perf_counter()
+    global_model = evaluate_model(class_dist, probe_labels, np.arange(len(names)), target_far, current_threshold)
+    cohort_models = {}
+    for cohort, members in sorted((cohorts or {}).items()):
+        classes = np.array(sorted(label_of[m] for m in set(members) if m in label_of), dtype=int)
+        if len(classes):
+            cohort_models[cohort] = evaluate_model(class_dist, probe_labels, classes, target_far, current_threshold)
+    timings["metrics"] = int((time.perf_counter() - t2) * 1000)
+
+    return {
+        "images": len(paths),
+        "people": len(names),
+        "exact": exact,
+        "timings_ms": timings,
+        "global": global_model,
+        "cohorts": cohort_models,
+    }
+
+if __name__ == "__main__":
+    import argparse
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Calibrate LBPH match thresholds on the faces gallery.")
+    parser.add_argument("--faces_dir", default=os.path.join(BASE_DIR, "data", "faces"))
+    parser.add_argument("--db", default=os.path.join(BASE_DIR, "data", "app.db"))
+    parser.add_argument("--cache_dir", default=os.path.join(BASE_DIR, "models", "eval_cache"))
+    parser.add_argument("--out", default=os.path.join(BASE_DIR, "models", "threshold_report.json"))
+    parser.add_argument("--target_far", type=float, default=0.01)
+    parser.add_argument("--threshold", type=float, default=75.0, help="Current threshold to report FAR/FRR for")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no_cache", action="store_true")
+    parser.add_argument("--exact", action="store_true", help="Exact impostor distances (slow on large galleries)")
+    args = parser.parse_args()
+
+    report = evaluate_thresholds(
+        args.faces_dir,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cohorts=load_cohorts(args.db),
+        target_far=args.target_far,
+        current_threshold=args.threshold,
+        workers=args.workers,
+        exact=args.exact,
+    )
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📊 {report['images']} images / {report['people']} people in {report['timings_ms']}")
+    if not report["exact"]:
+        print("  (approximate: impostor distances from a Hellinger shortlist can be slightly high, "
+              "so FAR may be underestimated; rerun with --exact to confirm)")
+    models = [("global", report["global"])] + [(f"cohort {c}", m) for c, m in report["cohorts"].items()]
+    for model, m in models:
+        print(f"  {model}: recommended {m['recommended_threshold']} "
+              f"(FAR {m['far_at_recommended']:.4f}, FRR {m['frr_at_recommended']:.4f}), "
+              f"EER {m['eer']:.4f} @ {m['eer_threshold']}, "
+              f"current {m['current']['threshold']}: FAR {m['current']['far']:.4f} FRR {m['current']['frr']:.4f}")
+    print(f"✅ Report saved to: {args.out}")
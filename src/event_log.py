@@ -0,0 +1,181 @@
+import os
+import glob
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class EventLog:
+    """
+    Buffered JSONL event log written by a background thread.
+
+    log() never blocks: records go on a bounded queue and are dropped (and counted)
+    when it is full. The writer thread flushes in batches every flush_interval seconds
+    or batch_size records, and rotates its file once it exceeds max_bytes or max_age
+    seconds. Each process writes its own file (events.<pid>.jsonl) so gunicorn workers
+    never interleave lines; rotated files are renamed to events.<pid>.<timestamp>.jsonl.
+    Only the newest `backups` rotated files per process are kept, and other processes'
+    files (e.g. from restarted workers) are deleted once older than `retention` seconds.
+    If the writer dies (e.g. read-only or full disk), log() restarts it at most every
+    retry_interval seconds; records lost meanwhile are counted in `dropped`.
+    """
+
+    def __init__(
+        self,
+        log_dir: str,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_bytes: int = 10 * 1024 * 1024,
+        max_age: float = 24 * 3600,
+        backups: int = 10,
+        retention: float = 7 * 24 * 3600,
+        retry_interval: float = 30.0,
+    ):
+        self.log_dir = log_dir
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.retention = retention
+        self.retry_interval = retry_interval
+
+        self.dropped = 0
+        self._reported_drops = 0
+        self._died_at = 0.0
+        self._pid = None
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def log(self, record: Dict[str, Any]) -> bool:
+        """
+        Enqueue a record. Returns False if it was dropped because the queue is full.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: float = 2.0):
+        """Flush what's queued and stop the writer thread."""
+        if self._thread is not None and self._pid == os.getpid():
+            self._stop.set()
+            self._thread.join(timeout)
+
+    def _running(self) -> bool:
+        # Threads don't survive fork (e.g. gunicorn --preload); a dead writer is retried after a pause
+        if self._pid != os.getpid():
+            return False
+        if self._thread.is_alive() or self._stop.is_set():
+            return True
+        return time.monotonic() - self._died_at < self.retry_interval
+
+    def _ensure_started(self):
+        if self._running():
+            return
+        with self._start_lock:
+            if self._running():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._reported_drops = self.dropped
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _path(self) -> str:
+        return os.path.join(self.log_dir, f"events.{self._pid}.jsonl")
+
+    def _rotate(self, f, opened_at: float):
+        if f.tell() < self.max_bytes and time.time() - opened_at < self.max_age:
+            return f, opened_at
+        f.close()
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"{int(now * 1000) % 1000:03d}"
+        os.replace(self._path(), os.path.join(self.log_dir, f"events.{self._pid}.{stamp}.jsonl"))
+        self._prune()
+        return open(self._path(), "a", encoding="utf-8"), time.time()
+
+    def _prune(self):
+        """Delete rotated files beyond `backups` for this pid and stale files of other pids."""
+        # Timestamps sort chronologically, so the oldest come first
+        own = sorted(glob.glob(os.path.join(self.log_dir, f"events.{self._pid}.*.jsonl")))
+        stale = own[:max(len(own) - self.backups, 0)]
+
+        cutoff = time.time() - self.retention
+        own_prefix = f"events.{self._pid}."
+        for path in glob.glob(os.path.join(self.log_dir, "events.*.jsonl")):
+            if os.path.basename(path).startswith(own_prefix):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    stale.append(path)
+            except OSError:
+                continue
+
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _run(self):
+        f = None
+        batch = []
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            self._prune()
+            f = open(self._path(), "a", encoding="utf-8")
+            opened_at = time.time()
+            while True:
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                    if self._stop.is_set():
+                        break
+
+                drops = self.dropped - self._reported_drops
+                if drops:
+                    batch.append({"ts": time.time(), "event": "dropped", "count": drops})
+
+                if batch:
+                    f.write("".join(json.dumps(r, default=str) + "\n" for r in batch))
+                    f.flush()
+                    self._reported_drops += drops
+                    batch = []
+                    f, opened_at = self._rotate(f, opened_at)
+
+                if self._stop.is_set() and self._queue.empty():
+                    break
+        except OSError as e:
+            # The records in hand are lost; later ones queue up until log() restarts the writer
+            self.dropped += sum(1 for r in batch if r.get("event") != "dropped")
+            logger.warning(f"Event log writer stopped ({e}); retrying in {self.retry_interval:g}s")
+        finally:
+            self._died_at = time.monotonic()
+            if f is not None:
+                try:
+                    f.close()
+                except OSError:
+                    pass
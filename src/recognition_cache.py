@@ -0,0 +1,161 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+def crop_fingerprint(face_img: np.ndarray) -> int:
+    """
+    64-bit difference hash (dHash) of a grayscale face crop.
+    Compares neighbouring cells of a 9x8 area-averaged thumbnail, so sensor noise and
+    global brightness changes between near-identical frames flip only a few bits.
+    """
+    small = cv2.resize(face_img, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def crop_thumbnail(face_img: np.ndarray) -> np.ndarray:
+    """
+    16x16 mean-centred thumbnail used to confirm a fingerprint match is really the same face.
+    """
+    small = cv2.resize(face_img, (16, 16), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return small - int(small.mean())
+
+class RecognitionCache:
+    """
+    Bounded LRU + TTL cache of recognizer.predict() results for near-duplicate crops.
+
+    Entries are keyed by (model_path, model_version, fingerprint) and hold (label, distance)
+    plus the crop's thumbnail. A probe hits an entry of the same model whose fingerprint is
+    within max_bits (Hamming distance) and whose thumbnail differs by at most max_diff gray
+    levels on average, so small box jitter still hits but a different person does not.
+    The threshold is applied by the caller, so cached results are valid for any threshold.
+
+    Fingerprints are indexed per model by band: the 64 bits are split into max_bits + 1
+    bands, and two fingerprints within max_bits of each other must agree on at least one
+    of them, so a lookup only compares entries that share a band with the probe.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 5.0, max_bits: int = 6, max_diff: float = 6.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bits = max_bits
+        self.max_diff = max_diff
+        self._bands = self._band_layout(max_bits)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, np.ndarray]]" = OrderedDict()
+        # (model_path, model_version) -> one {band value: {fingerprint, ...}} dict per band
+        self._index: Dict[Tuple[Hashable, Hashable], List[Dict[int, Set[int]]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # fingerprint close enough but thumbnail check failed
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _band_layout(max_bits: int) -> List[Tuple[int, int]]:
+        """(shift, mask) of each of the max_bits + 1 bands, as equal as 64 bits allow."""
+        count = min(max(max_bits, 0) + 1, 64)
+        layout, shift = [], 0
+        for b in range(count):
+            width = 64 // count + (1 if b < 64 % count else 0)
+            layout.append((shift, (1 << width) - 1))
+            shift += width
+        return layout
+
+    def _matches(self, thumb: np.ndarray, cached_thumb: np.ndarray) -> bool:
+        return float(np.abs(thumb - cached_thumb).mean()) <= self.max_diff
+
+    def _remove(self, key: Hashable):
+        del self._entries[key]
+        model_key, fingerprint = key[:2], key[2]
+        index = self._index[model_key]
+        for (shift, mask), buckets in zip(self._bands, index):
+            band = (fingerprint >> shift) & mask
+            buckets[band].discard(fingerprint)
+            if not buckets[band]:
+                del buckets[band]
+        if not index[0]:
+            del self._index[model_key]
+
+    def lookup(self, model_key: Tuple[Hashable, Hashable], fingerprint: int, thumb: np.ndarray) -> Optional[Any]:
+        """
+        Return the cached value for the closest near-duplicate crop of this model, or None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_bits, near = None, self.max_bits + 1, False
+            index = self._index.get(model_key)
+            if index is not None:
+                candidates: Set[int] = set()
+                for (shift, mask), buckets in zip(self._bands, index):
+                    candidates.update(buckets.get((fingerprint >> shift) & mask, ()))
+                for cached_fp in candidates:
+                    bits = bin(cached_fp ^ fingerprint).count("1")
+                    if bits >= best_bits:
+                        continue
+                    key = (*model_key, cached_fp)
+                    _, expires, cached_thumb = self._entries[key]
+                    if expires < now:
+                        continue
+                    near = True
+                    if self._matches(thumb, cached_thumb):
+                        best_key, best_bits = key, bits
+
+            if best_key is None:
+                if near:
+                    self.rejected += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][0]
+
+    def put(self, model_key: Tuple[Hashable, Hashable], fingerprint: int, thumb: np.ndarray, value: Any):
+        now = time.monotonic()
+        with self._lock:
+            key = (*model_key, fingerprint)
+            if key not in self._entries:
+                index = self._index.setdefault(model_key, [{} for _ in self._bands])
+                for (shift, mask), buckets in zip(self._bands, index):
+                    buckets.setdefault((fingerprint >> shift) & mask, set()).add(fingerprint)
+            self._entries[key] = (value, now + self.ttl, thumb)
+            self._entries.move_to_end(key)
+            # Drop expired entries from the LRU end; any others are skipped on lookup until evicted
+            while self._entries and next(iter(self._entries.values()))[1] < now:
+                self._remove(next(iter(self._entries)))
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, model_path: Optional[Hashable] = None):
+        """
+        Drop cached results for one model (all versions), or everything.
+        """
+        with self._lock:
+            if model_path is None:
+                self._entries.clear()
+                self._index.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == model_path]:
+                    self._remove(key)
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "max_bits": self.max_bits,
+                "max_diff": self.max_diff,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
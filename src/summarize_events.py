@@ -0,0 +1,118 @@
+import os
+import glob
+import json
+import time
+from typing import Dict, Any, List, Iterator, Optional
+
+import numpy as np
+
+def iter_events(log_dir: str, since: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield records from every event log in log_dir (active and rotated files).
+    Partial or corrupt lines (e.g. a file still being written) are skipped.
+    """
+    for path in sorted(glob.glob(os.path.join(log_dir, "events.*.jsonl"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if since is not None and record.get("ts", 0) < since:
+                    continue
+                yield record
+
+def _percentiles(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=float)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "max": round(float(arr.max()), 2),
+        "mean": round(float(arr.mean()), 2),
+    }
+
+def summarize_events(log_dir: str, since: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Aggregate request events into per-endpoint latency and match-rate summaries:
+      {"requests", "dropped", "endpoints": {endpoint: {...}}}
+
+    match_rate is over requests where at least one face was found.
+    """
+    per_endpoint: Dict[str, Dict[str, Any]] = {}
+    total = dropped = 0
+
+    for record in iter_events(log_dir, since):
+        if record.get("event") == "dropped":
+            dropped += record.get("count", 0)
+            continue
+        total += 1
+        ep = per_endpoint.setdefault(record.get("endpoint", "unknown"), {
+            "requests": 0, "errors": 0, "with_faces": 0, "matched": 0,
+            "latency": [], "stages": {}, "distances": [], "workers": set(),
+            "cache_hits": 0, "cache_misses": 0,
+        })
+        ep["requests"] += 1
+        if record.get("status", 200) >= 400:
+            ep["errors"] += 1
+        if record.get("duration_ms") is not None:
+            ep["latency"].append(record["duration_ms"])
+        for stage, ms in (record.get("stages") or {}).items():
+            ep["stages"].setdefault(stage, []).append(ms)
+        if record.get("faces"):
+            ep["with_faces"] += 1
+            if record.get("matched"):
+                ep["matched"] += 1
+        if record.get("distance") is not None:
+            ep["distances"].append(record["distance"])
+        ep["cache_hits"] += record.get("cache_hits", 0)
+        ep["cache_misses"] += record.get("cache_misses", 0)
+        if "worker" in record:
+            ep["workers"].add(record["worker"])
+
+    endpoints = {}
+    for name, ep in sorted(per_endpoint.items()):
+        lookups = ep["cache_hits"] + ep["cache_misses"]
+        endpoints[name] = {
+            "requests": ep["requests"],
+            "error_rate": round(ep["errors"] / ep["requests"], 4),
+            "with_faces": ep["with_faces"],
+            "match_rate": round(ep["matched"] / ep["with_faces"], 4) if ep["with_faces"] else None,
+            "latency_ms": _percentiles(ep["latency"]),
+            "stages_ms": {stage: _percentiles(v) for stage, v in sorted(ep["stages"].items())},
+            "distance": _percentiles(ep["distances"]),
+            "workers": len(ep["workers"]),
+            "cache_hit_rate": round(ep["cache_hits"] / lookups, 4) if lookups else None,
+        }
+
+    return {"requests": total, "dropped": dropped, "endpoints": endpoints}
+
+if __name__ == "__main__":
+    import argparse
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Summarize request/verification event logs.")
+    parser.add_argument("--log_dir", default=os.path.join(BASE_DIR, "logs"))
+    parser.add_argument("--hours", type=float, default=None, help="Only include the last N hours")
+    parser.add_argument("--json", action="store_true", help="Print the full summary as JSON")
+    args = parser.parse_args()
+
+    since = time.time() - args.hours * 3600 if args.hours else None
+    summary = summarize_events(args.log_dir, since)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"📊 {summary['requests']} requests ({summary['dropped']} dropped events)")
+        for name, ep in summary["endpoints"].items():
+            lat = ep["latency_ms"]
+            match = f"{ep['match_rate']:.1%}" if ep["match_rate"] is not None else "-"
+            print(f"  {name}: {ep['requests']} req, errors {ep['error_rate']:.1%}, match {match}, "
+                  f"p50 {lat.get('p50', '-')}ms p95 {lat.get('p95', '-')}ms p99 {lat.get('p99', '-')}ms")
+            if ep["cache_hit_rate"] is not None:
+                print(f"      recognition cache hit rate: {ep['cache_hit_rate']:.1%}")
+            for stage, st in ep["stages_ms"].items():
+                print(f"      {stage}: p50 {st['p50']}ms p95 {st['p95']}ms")
@@ -1,28 +1,33 @@
 import os
 import json
-from typing import Dict, Any, Tuple, List
+import hashlib
+from typing import Dict, Any, List
 
 import cv2
 import numpy as np
 
-def train_model(
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+def _person_images(faces_dir: str, person_name: str) -> List[str]:
+    person_dir = os.path.join(faces_dir, person_name)
+    if not os.path.isdir(person_dir):
+        return []
+    return [
+        os.path.join(person_dir, img_name)
+        for img_name in sorted(os.listdir(person_dir))
+        if img_name.lower().endswith(IMAGE_EXTS)
+    ]
+
+def _train_people(
     faces_dir: str,
+    people: List[str],
     model_path: str,
     label_map_path: str,
 ) -> Dict[str, Any]:
     """
-    Train an LBPH face recognizer from a folder structure:
-      faces_dir/
-        personA/001.jpg ...
-        personB/001.jpg ...
-
-    Saves:
-      - model_path (xml)
-      - label_map_path (json): {"0": "personA", "1": "personB"}
-
-    Returns training summary dict.
+    Train and save an LBPH model over the given people (labels assigned in order).
+    Raises RuntimeError if none of them have images.
     """
-    os.makedirs(faces_dir, exist_ok=True)
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
 
     recognizer = cv2.face.LBPHFaceRecognizer_create()
@@ -32,17 +37,12 @@ def train_model(
     label_map: Dict[int, str] = {}
     current_label = 0
 
-    for person_name in sorted(os.listdir(faces_dir)):
-        person_dir = os.path.join(faces_dir, person_name)
-        if not os.path.isdir(person_dir):
+    for person_name in people:
+        if not os.path.isdir(os.path.join(faces_dir, person_name)):
             continue
 
         label_map[current_label] = person_name
-        for img_name in sorted(os.listdir(person_dir)):
-            if not img_name.lower().endswith((".jpg", ".jpeg", ".png")):
-                continue
-            img_path = os.path.join(person_dir, img_name)
-
+        for img_path in _person_images(faces_dir, person_name):
             img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
             if img is None:
                 continue
@@ -72,6 +72,88 @@ def train_model(
         "label_map": label_map,
     }
 
+def train_model(
+    faces_dir: str,
+    model_path: str,
+    label_map_path: str,
+) -> Dict[str, Any]:
+    """
+    Train an LBPH face recognizer from a folder structure:
+      faces_dir/
+        personA/001.jpg ...
+        personB/001.jpg ...
+
+    Saves:
+      - model_path (xml)
+      - label_map_path (json): {"0": "personA", "1": "personB"}
+
+    Returns training summary dict.
+    """
+    os.makedirs(faces_dir, exist_ok=True)
+    return _train_people(faces_dir, sorted(os.listdir(faces_dir)), model_path, label_map_path)
+
+def _cohort_fingerprint(faces_dir: str, people: List[str]) -> str:
+    """
+    Hash of a cohort's members and their image files (name, size, mtime), so a
+    cohort is retrained only when its membership or training images change.
+    """
+    h = hashlib.sha1()
+    for person_name in people:
+        h.update(f"person:{person_name}\n".encode("utf-8"))
+        for img_path in _person_images(faces_dir, person_name):
+            st = os.stat(img_path)
+            h.update(f"{os.path.basename(img_path)}:{st.st_size}:{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def train_cohort_models(
+    faces_dir: str,
+    cohorts_dir: str,
+    cohorts: Dict[str, List[str]],
+    force: bool = False,
+) -> Dict[str, Any]:
+    """
+    Train one LBPH model per cohort, each covering only that cohort's members:
+      cohorts_dir/
+        <cohort>/lbph_model.xml
+        <cohort>/label_map.json
+        <cohort>/manifest.json   (fingerprint of the data it was trained on)
+
+    Cohorts whose fingerprint is unchanged are skipped unless force=True.
+    Cohorts with no images have their stale model removed.
+
+    Returns {cohort: {"status": "trained" | "unchanged" | "empty", ...}}.
+    """
+    # Shared with the serving path (app.model_paths); only importable from the app root
+    from config import cohort_model_paths
+
+    summary: Dict[str, Any] = {}
+    for cohort, members in sorted(cohorts.items()):
+        people = sorted(set(members))
+        model_path, label_map_path = cohort_model_paths(cohorts_dir, cohort)
+        manifest_path = os.path.join(os.path.dirname(model_path), "manifest.json")
+        fingerprint = _cohort_fingerprint(faces_dir, people)
+
+        if not force and os.path.exists(model_path) and os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                if json.load(f).get("fingerprint") == fingerprint:
+                    summary[cohort] = {"status": "unchanged", "model_path": model_path}
+                    continue
+
+        try:
+            result = _train_people(faces_dir, people, model_path, label_map_path)
+        except RuntimeError:
+            for path in (model_path, label_map_path, manifest_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            summary[cohort] = {"status": "empty"}
+            continue
+
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "people": people}, f, indent=2)
+        summary[cohort] = {"status": "trained", **result}
+
+    return summary
+
 if __name__ == "__main__":
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     faces_dir = os.path.join(BASE_DIR, "data", "faces")
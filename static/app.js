@@ -43,6 +43,22 @@ let abortController = null;
 let scanInterval = null;
 let activeMode = null; // 'register' or 'verify'
 let verifiedCount = 0;
+// Kiosk cohort (e.g. /dashboard?cohort=event-2024): only that cohort's model is searched
+const kioskCohort = new URLSearchParams(window.location.search).get("cohort");
+
+// ROI mode: while verifying, upload only padded face crops instead of whole frames.
+// Faces are located with the browser FaceDetector when available, otherwise the
+// boxes from the previous server response are reused.
+const ROI_MODE = true;
+const ROI_PADDING = 0.35;          // fraction of the face box added on each side
+const ROI_TARGET_SIZE = 240;       // face box is downscaled to about this many px
+const ROI_MAX_CROPS = 4;
+const ROI_FULL_FRAME_EVERY = 10;   // periodic full frame to pick up new faces
+const faceDetector = "FaceDetector" in window
+  ? new window.FaceDetector({ fastMode: true, maxDetectedFaces: ROI_MAX_CROPS })
+  : null;
+let lastBoxes = [];
+let roiTick = 0;
 
 /**
  * UI Helpers
@@ -181,39 +197,96 @@ async function captureAndProcess() {
   isRequestPending = true;
   abortController = new AbortController();
 
+  try {
+    const boxes = activeMode === "verify" && ROI_MODE ? await localizeFaces() : [];
+    if (boxes.length) await processCrops(boxes);
+    else await processFullFrame();
+  } catch (err) {
+    if (err.name !== "AbortError") {
+      updateStatus("Processing error: " + err.message);
+    }
+  } finally {
+    isRequestPending = false;
+  }
+}
+
+async function localizeFaces() {
+  roiTick++;
+  if (faceDetector) {
+    try {
+      const detected = await faceDetector.detect(elements.video);
+      if (detected.length) {
+        return detected.map(d => ({
+          x: d.boundingBox.x, y: d.boundingBox.y, w: d.boundingBox.width, h: d.boundingBox.height
+        }));
+      }
+    } catch (e) { }
+  }
+  if (roiTick % ROI_FULL_FRAME_EVERY === 0) return [];
+  return lastBoxes;
+}
+
+async function processFullFrame() {
   const captureCanvas = document.createElement("canvas");
   captureCanvas.width = elements.video.videoWidth;
   captureCanvas.height = elements.video.videoHeight;
   captureCanvas.getContext("2d").drawImage(elements.video, 0, 0);
   const base64 = captureCanvas.toDataURL("image/jpeg", 0.7);
 
-  try {
-    const response = await fetch("/process_frame", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ image: base64 }),
-      signal: abortController.signal
-    });
-
-    const data = await response.json();
-    if (data.ok) {
-      drawOverlays(data.faces);
-      if (elements.perfCounter) elements.perfCounter.textContent = `${data.processing_ms}ms`;
+  const response = await fetch("/process_frame", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    // Cohort only scopes verification; registration must work before the cohort is trained
+    body: JSON.stringify({ image: base64, cohort: activeMode === "verify" && kioskCohort ? kioskCohort : undefined }),
+    signal: abortController.signal
+  });
 
-      if (activeMode === "verify" && data.matched) {
-        handleMatch(data.name);
-      }
+  const data = await response.json();
+  if (data.ok) {
+    handleFrameResult(data);
 
-      if (activeMode === "register") {
-        handleRegisterFrame(base64);
-      }
-    }
-  } catch (err) {
-    if (err.name !== "AbortError") {
-      updateStatus("Processing error: " + err.message);
+    if (activeMode === "register") {
+      handleRegisterFrame(base64);
     }
-  } finally {
-    isRequestPending = false;
+  }
+}
+
+async function processCrops(boxes) {
+  const video = elements.video;
+  const crops = boxes.slice(0, ROI_MAX_CROPS).map(b => {
+    const pad = Math.round(Math.max(b.w, b.h) * ROI_PADDING);
+    const x = Math.max(0, Math.round(b.x - pad));
+    const y = Math.max(0, Math.round(b.y - pad));
+    const w = Math.min(video.videoWidth - x, Math.round(b.w + 2 * pad));
+    const h = Math.min(video.videoHeight - y, Math.round(b.h + 2 * pad));
+    const scale = Math.min(1, ROI_TARGET_SIZE / Math.max(b.w, b.h));
+
+    const cropCanvas = document.createElement("canvas");
+    cropCanvas.width = Math.round(w * scale);
+    cropCanvas.height = Math.round(h * scale);
+    cropCanvas.getContext("2d").drawImage(video, x, y, w, h, 0, 0, cropCanvas.width, cropCanvas.height);
+    return { image: cropCanvas.toDataURL("image/jpeg", 0.8), x, y, scale };
+  });
+
+  const response = await fetch("/api/v1/verify_crops", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ crops, cohort: kioskCohort || undefined }),
+    signal: abortController.signal
+  });
+
+  const data = await response.json();
+  if (data.ok) handleFrameResult(data);
+  else lastBoxes = [];
+}
+
+function handleFrameResult(data) {
+  lastBoxes = activeMode === "verify" ? data.faces : [];
+  drawOverlays(data.faces);
+  if (elements.perfCounter) elements.perfCounter.textContent = `${data.processing_ms}ms`;
+
+  if (activeMode === "verify" && data.matched) {
+    handleMatch(data.name);
   }
 }
 
@@ -245,7 +318,12 @@ async function handleRegisterFrame(base64) {
     const res = await fetch("/api/register", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ name, email: elements.regEmail.value, image: base64 })
+      body: JSON.stringify({
+        name,
+        email: elements.regEmail.value,
+        image: base64,
+        cohorts: kioskCohort ? [kioskCohort] : undefined
+      })
     });
     const data = await res.json();
     if (data.captured) {
@@ -321,6 +399,7 @@ window.verifyFace = () => {
 
 window.cancelVerify = () => {
   activeMode = null;
+  lastBoxes = [];
   if (elements.btnCancelVerify) elements.btnCancelVerify.style.display = "none";
   if (elements.verifyResult) elements.verifyResult.textContent = "Awaiting input...";
   const ctx = elements.canvas.getContext("2d");